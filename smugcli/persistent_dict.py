@@ -26,6 +26,11 @@ WrappableTypeVar = TypeVar('WrappableTypeVar',
 NonWrappableTypeVar = TypeVar('NonWrappableTypeVar',
                               bound=NonWrappableTypes)
 
+# Methods of the wrapped containers that never modify them, and therefore
+# don't require saving to disk after being called.
+_READ_ONLY_METHODS = frozenset(
+    ['copy', 'count', 'get', 'index', 'items', 'keys', 'values'])
+
 
 def _maybe_wrap(
     persistent_dict: 'PersistentDict',
@@ -50,7 +55,8 @@ class _PersistentDictWrapper(Generic[WrappableTypeVar]):
     if hasattr(attribute, '__call__'):
       def wrapped_function(*args, **kwargs):
         result = attribute(*args, **kwargs)
-        self._persistent_dict.save_to_disk()
+        if name not in _READ_ONLY_METHODS:
+          self._persistent_dict.save_to_disk()
         return _maybe_wrap(self._persistent_dict, result)
       return wrapped_function
     return _maybe_wrap(self._persistent_dict, attribute)
@@ -114,7 +120,8 @@ class PersistentDict():
     if hasattr(attribute, '__call__'):
       def wrapped_function(*args, **kwargs):
         result = attribute(*args, **kwargs)
-        self.save_to_disk()
+        if name not in _READ_ONLY_METHODS:
+          self.save_to_disk()
         return _maybe_wrap(self, result)
       return wrapped_function
     return _maybe_wrap(self, attribute)
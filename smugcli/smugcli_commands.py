@@ -313,7 +313,7 @@ def run(args,
                               nargs='+',
                               help=('List of paths to include during sync.'))
   # ---------------
-  smugmug_shell.SmugMugShell.set_parser(main_parser)
+  smugmug_shell.SmugMugShell.set_parser(subparsers)
   shell_parser = subparsers.add_parser(
       'shell', help=('Start smugcli in interactive shell mode.'))
   shell_parser.set_defaults(
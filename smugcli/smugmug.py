@@ -1,7 +1,7 @@
 """Python interface to SmugMug's V2 API."""
 
-from typing import Any, List, MutableMapping, MutableSequence, Optional, Tuple
-from typing import Union
+from typing import Any, Dict, Iterator, List, MutableMapping  # noqa: F401
+from typing import MutableSequence, Optional, Tuple, Union  # noqa: F401
 
 import base64
 import collections
@@ -16,12 +16,24 @@ import threading
 import requests
 import requests_oauthlib
 
+try:
+  # Optional, parses large API responses several times faster.
+  import orjson as json_parser
+except ImportError:
+  import json as json_parser
+
 from . import smugmug_oauth
 
 API_ROOT = 'https://api.smugmug.com'
 API_UPLOAD = 'https://upload.smugmug.com/'
 API_REQUEST = 'https://api.smugmug.com/api/developer/apply'
 
+# Headers of all API requests. `requests` copies them when preparing requests.
+# Requests are prepared outside of the session, so they don't get its default
+# headers: compressed responses must be asked for explicitly.
+JSON_HEADERS = {'Accept': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'}
+
 PAGE_START_RE = re.compile(r'(\?.*start=)[0-9]+')
 
 
@@ -120,6 +132,13 @@ class ChildCacheGarbageCollector():
 class NodeList():
   """A list of JSON node returned by SmugMug."""
 
+  __slots__ = ('_smugmug', '_parent', '_page_size', '_total_size', '_pages',
+               '_uri', '_page_fetched', '_lock')
+
+  # Default maximum number of pages fetched in parallel when iterating over
+  # lists, shared by all lists of a `SmugMug` instance.
+  MAX_PARALLEL_PAGE_FETCHES = 4
+
   def __init__(self, smugmug: 'SmugMug', json, parent):
     self._smugmug = smugmug
     self._parent = parent
@@ -134,7 +153,12 @@ class NodeList():
     self._pages = [None] * num_pages  # type: MutableSequence[Any]
     if num_pages:
       self._pages[0] = response[locator]
-    self._uri = PAGE_START_RE.sub(r'\1%d', response['Uri'])
+    # Only lists spanning multiple pages ever need to fetch another page.
+    self._uri = (PAGE_START_RE.sub(r'\1%d', response['Uri'])
+                 if num_pages > 1 else None)
+    # Set for each page once its prefetch completes, successfully or not.
+    self._page_fetched = None  # type: Optional[Dict[int, threading.Event]]
+    self._lock = threading.Lock()
 
   def __len__(self) -> int:
     return self._total_size
@@ -143,21 +167,80 @@ class NodeList():
     if item < 0 or item >= self._total_size:
       raise IndexError
 
-    page_index = int(item / self._page_size)
-    if self._pages[page_index] is None:
-      new_page_uri = self._uri % (page_index * self._page_size + 1)
-      json = self._smugmug.get_json(new_page_uri)
-      response = json['Response']
-      locator = response['Locator']
-      self._pages[page_index] = response[locator]
-    return Node(self._smugmug,
-                self._pages[page_index][item - page_index * self._page_size],
-                self._parent)
+    page_index, page_offset = divmod(item, self._page_size)
+    page = self._get_page(page_index)
+    return Node(self._smugmug, page[page_offset], self._parent)
+
+  def __iter__(self) -> Iterator['Node']:
+    """Iterates over the nodes, prefetching all missing pages in parallel."""
+    self._prefetch_pages()
+    for page_index in range(len(self._pages)):
+      for json in self._get_page(page_index):
+        yield Node(self._smugmug, json, self._parent)
+
+  def _get_page(self, page_index: int) -> List[Any]:
+    page = self._pages[page_index]
+    if page is None:
+      if self._page_fetched is not None and page_index in self._page_fetched:
+        self._page_fetched[page_index].wait()
+        page = self._pages[page_index]
+      if page is None:
+        # Not prefetched, or prefetching failed, in which case fetching the
+        # page again raises the error to the caller.
+        page = self._fetch_page(page_index)
+    return page
+
+  def _prefetch_pages(self) -> None:
+    """Starts fetching all the missing pages, in order, in parallel.
+
+    At most `SmugMug.max_page_fetches` pages are fetched at once, across all
+    lists. If that limit is 1, pages are instead fetched inline as they are
+    reached.
+    """
+    max_page_fetches = self._smugmug.max_page_fetches
+    if max_page_fetches <= 1:
+      return
+    slots = self._smugmug.page_fetch_slots
+    with self._lock:
+      if self._page_fetched is not None:
+        return
+      pending = collections.deque(
+          i for i, page in enumerate(self._pages) if page is None)
+      self._page_fetched = {i: threading.Event() for i in pending}
+
+    def fetch_pages() -> None:
+      while True:
+        try:
+          page_index = pending.popleft()
+        except IndexError:
+          return
+        try:
+          with slots:
+            self._fetch_page(page_index)
+        except Exception:  # pylint: disable=broad-except
+          pass  # The page is fetched again, raising the error, when reached.
+        finally:
+          self._page_fetched[page_index].set()
+
+    for _ in range(min(len(pending), max_page_fetches)):
+      threading.Thread(target=fetch_pages, daemon=True).start()
+
+  def _fetch_page(self, page_index: int) -> List[Any]:
+    new_page_uri = self._uri % (page_index * self._page_size + 1)
+    json = self._smugmug.get_json(new_page_uri)
+    response = json['Response']
+    locator = response['Locator']
+    self._pages[page_index] = response[locator]
+    return self._pages[page_index]
 
 
 class Node():
   """A single JSON object node returned by SmugMug."""
 
+  # Syncing creates a node per remote file, spare each of them a `__dict__`.
+  __slots__ = ('_smugmug', '_json', '_parent', '_child_nodes_by_name',
+               '_pending_creations', '_lock')
+
   def __init__(
       self,
       smugmug: 'SmugMug',
@@ -169,6 +252,9 @@ class Node():
     self._json = json
     self._parent = parent
     self._child_nodes_by_name = child_nodes_by_name
+    # Children being created, only allocated by the nodes getting children.
+    self._pending_creations = (
+        None)  # type: Optional[MutableMapping[str, threading.Event]]
     self._lock = threading.Lock()
 
   @property
@@ -215,7 +301,16 @@ class Node():
   def delete(self, **kwargs):
     """Does a DELETE request to this node's `uri_name` endpoint."""
     uri = self._json.get('Uri')
-    return self._smugmug.delete(uri, **kwargs)
+    response = self._smugmug.delete(uri, **kwargs)
+
+    # Drop this node from the children cache of the node listing it. Files are
+    # listed by their album node, the grandparent of their nodes.
+    parent = self._parent
+    while parent is not None:
+      if parent._discard_child(self):  # pylint: disable=protected-access
+        break
+      parent = parent._parent  # pylint: disable=protected-access
+    return response
 
   def upload(self, uri_name, filename, data, progress_fn=None, headers=None):
     """Does an UPLOAD request to this node's `uri_name` endpoint."""
@@ -224,7 +319,10 @@ class Node():
 
   def uri(self, url_name: str) -> str:
     """Returns the uri of this node's `url_name` child."""
-    uri = self._json.get('Uris', {}).get(url_name, {}).get('Uri')
+    try:
+      uri = self._json['Uris'][url_name]['Uri']
+    except KeyError:
+      uri = None
     if not uri:
       raise UnexpectedResponseError(f'Node does not have a "{url_name}" uri.')
     if not isinstance(uri, str):
@@ -314,9 +412,10 @@ class Node():
           f'{child_node_type}s can only be created in folders.\n'
           f'"{self.name}" is of type "{node_type}".')
 
-    if name in self._get_child_nodes_by_name():
-      raise InvalidArgumentError(
-          f'Node {name} already exists in folder {self.name}')
+    with self._lock:
+      if name in self._get_child_nodes_by_name():
+        raise InvalidArgumentError(
+            f'Node {name} already exists in folder {self.name}')
 
     remote_name = name.strip()
     node_params = {
@@ -332,8 +431,8 @@ class Node():
     response = self.post('ChildNodes', data=sorted(node_params.items()))
 
     try:
-      response_json = response.json()
-    except requests.exceptions.JSONDecodeError as exc:
+      response_json = json_parser.loads(response.content)
+    except ValueError as exc:
       raise UnexpectedResponseError(
           f'Error creating node "{name}".\n'
           'Expected a JSON response from SmugMug service.') from exc
@@ -345,7 +444,8 @@ class Node():
     node = Node(self._smugmug, node_json, parent=self,
                 child_nodes_by_name={})
     self._smugmug.garbage_collector.visited(node)
-    self._get_child_nodes_by_name()[name] = [node]
+    with self._lock:
+      self._get_child_nodes_by_name()[name] = [node]
 
     if node.node_type() == 'Album':
       node.patch('Album', json={'SortMethod': 'DateTimeOriginal'})
@@ -367,11 +467,34 @@ class Node():
 
   def get_or_create_child(
       self, name: str, node_type: str, privacy: str) -> 'Node':
-    """Returns this node's `name` child, create it if not found."""
-    with self._lock:
-      match = self._get_child_nodes_by_name().get(name)
-      if not match:
-        return self._create_child_node(name, node_type, privacy)
+    """Returns this node's `name` child, create it if not found.
+
+    The parent's lock is not held while the child is being created, so that
+    distinct siblings can be created concurrently. Threads requesting the
+    creation of a child that is already being created wait for that creation
+    to complete instead of issuing a duplicate request.
+    """
+    while True:
+      with self._lock:
+        match = self._get_child_nodes_by_name().get(name)
+        if match:
+          break
+        if self._pending_creations is None:
+          self._pending_creations = {}
+        pending = self._pending_creations.get(name)
+        creating = pending is None
+        if creating:
+          pending = threading.Event()
+          self._pending_creations[name] = pending
+
+      if creating:
+        try:
+          return self._create_child_node(name, node_type, privacy)
+        finally:
+          with self._lock:
+            del self._pending_creations[name]
+          pending.set()
+      pending.wait()
 
     if len(match) > 1:
       raise RemoteDataError(
@@ -379,6 +502,19 @@ class Node():
 
     return match[0]
 
+  def _discard_child(self, child: 'Node') -> bool:
+    """Removes `child` from the children cache, returns whether it was there."""
+    with self._lock:
+      if self._child_nodes_by_name is None:
+        return False
+      nodes = self._child_nodes_by_name.get(child.name)
+      if not nodes or all(node is not child for node in nodes):
+        return False
+      nodes[:] = [node for node in nodes if node is not child]
+      if not nodes:
+        del self._child_nodes_by_name[child.name]
+      return True
+
   def reset_cache(self) -> None:
     """Reset this node's children cache."""
     with self._lock:
@@ -386,17 +522,49 @@ class Node():
 
 
 class StreamingUpload():
-  """Helper for uploading a data stream to SmugMug."""
+  """Helper for uploading a data stream to SmugMug.
+
+  `data` can either be a `bytes` object or a seekable binary file object. File
+  objects are streamed from their current position, without being loaded in
+  memory.
+  """
+
+  _CHUNK_SIZE = 1024 * 1024
 
   def __init__(self, data, progress_fn):
-    self._data = io.BytesIO(data)
-    self._len = len(data)
+    if isinstance(data, bytes):
+      data = io.BytesIO(data)
+    self._data = data
+    self._start = data.tell()
+    self._len = data.seek(0, io.SEEK_END) - self._start
+    data.seek(self._start)
     self._progress_fn = progress_fn
     self._progress = 0
 
   def __len__(self):
     return self._len
 
+  def md5(self) -> bytes:
+    """Returns the MD5 digest of the remaining data, leaving position as-is."""
+    start = self._data.tell()
+    md5 = hashlib.md5()
+    for chunk in iter(lambda: self._data.read(self._CHUNK_SIZE), b''):
+      md5.update(chunk)
+    self._data.seek(start)
+    return md5.digest()
+
+  def getvalue(self) -> bytes:
+    """Returns the data to upload, leaving position and progress as-is.
+
+    The data is read from the position the stream had when this object was
+    created, which is where the upload starts.
+    """
+    pos = self._data.tell()
+    self._data.seek(self._start)
+    value = self._data.read(self._len)
+    self._data.seek(pos)
+    return value
+
   def read(self, size=-1):
     """Read `size` bytes from stream."""
     chunk = self._data.read(size)
@@ -427,8 +595,13 @@ class SmugMug():
     self._config = config
     self._smugmug_oauth = None
     self._oauth = None
+    self._auth_user = None  # type: Optional[str]
     self._user_root_node = None
     self._session = requests.Session()
+    self._max_connections = None  # type: Optional[int]
+    self._mount_adapter(requests.adapters.DEFAULT_POOLSIZE)
+    self._max_page_fetches = NodeList.MAX_PARALLEL_PAGE_FETCHES
+    self._page_fetch_slots = threading.BoundedSemaphore(self._max_page_fetches)
     self._requests_sent = requests_sent
     self._garbage_collector = ChildCacheGarbageCollector(8)
 
@@ -442,6 +615,55 @@ class SmugMug():
     """Returns the garbage collector."""
     return self._garbage_collector
 
+  @property
+  def max_page_fetches(self) -> int:
+    """Returns the maximum number of list pages prefetched in parallel."""
+    return self._max_page_fetches
+
+  @property
+  def page_fetch_slots(self) -> threading.BoundedSemaphore:
+    """Returns the semaphore bounding the number of page prefetches."""
+    return self._page_fetch_slots
+
+  def set_max_connections(
+      self,
+      max_connections: int,
+      max_page_fetches: int = NodeList.MAX_PARALLEL_PAGE_FETCHES) -> None:
+    """Set the number of connections kept alive to each SmugMug host.
+
+    The HTTP session discards connections above its pool size once their
+    request completes. The pool keeps a connection for each thread sending
+    requests and for each page prefetch, so that every request can reuse a
+    kept-alive connection.
+
+    Args:
+      max_connections: int, the number of threads sending requests in parallel.
+      max_page_fetches: int, the maximum number of list pages prefetched in
+        parallel, across all lists. If 1, pages are fetched inline instead.
+    """
+    if max_page_fetches != self._max_page_fetches:
+      self._max_page_fetches = max_page_fetches
+      self._page_fetch_slots = threading.BoundedSemaphore(max_page_fetches)
+    pool_maxsize = max_connections + max_page_fetches
+    if pool_maxsize != self._max_connections:
+      self._mount_adapter(pool_maxsize)
+
+  def _mount_adapter(self, pool_maxsize: int) -> None:
+    # Transient server errors on idempotent requests are retried. The last
+    # response is returned, rather than raising, if they keep failing.
+    retries = requests.adapters.Retry(total=3,
+                                      backoff_factor=0.3,
+                                      status_forcelist=(500, 502, 503, 504),
+                                      raise_on_status=False)
+    replaced_adapter = self._session.adapters.get('https://')
+    self._session.mount('https://', requests.adapters.HTTPAdapter(
+        pool_maxsize=pool_maxsize, max_retries=retries))
+    self._max_connections = pool_maxsize
+    # Close the connections kept alive by the previous pool right away rather
+    # than whenever it gets garbage collected.
+    if replaced_adapter is not None:
+      replaced_adapter.close()
+
   @property
   def service(self) -> smugmug_oauth.SmugMugOAuth:
     """Creates and returns a SmugMugOAuth instance."""
@@ -473,6 +695,9 @@ class SmugMug():
   def login(self, key: str, secret: str) -> None:
     """Does an OAuth login to the SmugMug service."""
     self.config['api_key'] = (key, secret)
+    # The OAuth client and signer are cached, drop those of any prior login.
+    self._smugmug_oauth = None
+    self._oauth = None
     access_token = self.service.request_access_token()
     self.config['access_token'] = (access_token.token, access_token.secret)
 
@@ -486,17 +711,23 @@ class SmugMug():
       del self.config['authuser']
     if 'authuser_uri' in self.config:
       del self.config['authuser_uri']
+    self._smugmug_oauth = None
+    self._oauth = None
+    self._auth_user = None
+    self._user_root_node = None
 
   def get_auth_user(self) -> str:
     """Returns the name of the currently logged-in user."""
-    if 'authuser' not in self.config:
-      nickname = self.get_node('/api/v2!authuser')['NickName']
-      if not isinstance(nickname, str):
-        raise UnexpectedResponseError(
-            'Expected auth user nickname to be a string, but '
-            f'got "{repr(nickname)}".')
-      self.config['authuser'] = nickname
-    return self.config['authuser']
+    if self._auth_user is None:
+      if 'authuser' not in self.config:
+        nickname = self.get_node('/api/v2!authuser')['NickName']
+        if not isinstance(nickname, str):
+          raise UnexpectedResponseError(
+              'Expected auth user nickname to be a string, but '
+              f'got "{repr(nickname)}".')
+        self.config['authuser'] = nickname
+      self._auth_user = self.config['authuser']
+    return self._auth_user
 
   def get_user_uri(self, user: str) -> str:
     """Returns the specified user's root node URI."""
@@ -520,19 +751,27 @@ class SmugMug():
       return self.get_auth_user_root_node()
     return self.get_node(self.get_user_uri(user))
 
-  def get_json(self, path: str, **kwargs):
-    """Queries the specified path and return its JSON payload."""
-    req = requests.Request('GET', API_ROOT + path,
-                           headers={'Accept': 'application/json'},
+  def _send_api_request(
+      self, method: str, path: str, **kwargs) -> requests.Response:
+    """Sends a request to the specified API path, raising on HTTP errors."""
+    req = requests.Request(method,
+                           API_ROOT + path,
+                           headers=JSON_HEADERS,
                            auth=self.oauth,
                            **kwargs).prepare()
     resp = self._session.send(req)
     if self._requests_sent is not None:
       self._requests_sent.append((req, resp))
     resp.raise_for_status()
+    return resp
+
+  def get_json(self, path: str, **kwargs):
+    """Queries the specified path and return its JSON payload."""
+    resp = self._send_api_request('GET', path, **kwargs)
     try:
-      return resp.json()
-    except requests.exceptions.JSONDecodeError as exc:
+      # Parse the raw bytes, sparing a decoding to `str` for orjson.
+      return json_parser.loads(resp.content)
+    except ValueError as exc:
       raise UnexpectedResponseError(
           f'Error parsing responses from "{path}".\n'
           'Expected a JSON response from SmugMug service.') from exc
@@ -560,51 +799,27 @@ class SmugMug():
 
   def post(self, path: str, data=None, json=None, **kwargs):
     """Does a POST request to the specified path"""
-    req = requests.Request('POST',
-                           API_ROOT + path,
-                           data=data,
-                           json=json,
-                           headers={'Accept': 'application/json'},
-                           auth=self.oauth,
-                           **kwargs).prepare()
-    resp = self._session.send(req)
-    if self._requests_sent is not None:
-      self._requests_sent.append((req, resp))
-    resp.raise_for_status()
-    return resp
+    return self._send_api_request('POST', path, data=data, json=json, **kwargs)
 
   def patch(self, path: str, data=None, json=None, **kwargs):
     """Does a PATCH request to the specified path"""
-    req = requests.Request('PATCH',
-                           API_ROOT + path,
-                           data=data, json=json,
-                           headers={'Accept': 'application/json'},
-                           auth=self.oauth,
-                           **kwargs).prepare()
-    resp = self._session.send(req)
-    if self._requests_sent is not None:
-      self._requests_sent.append((req, resp))
-    resp.raise_for_status()
-    return resp
+    return self._send_api_request('PATCH', path, data=data, json=json,
+                                  **kwargs)
 
   def delete(self, path: str, **kwargs):
     """Does a DELETE request to the specified path"""
-    req = requests.Request('DELETE',
-                           API_ROOT + path,
-                           auth=self.oauth,
-                           headers={'Accept': 'application/json'},
-                           **kwargs).prepare()
-    resp = self._session.send(req)
-    if self._requests_sent is not None:
-      self._requests_sent.append((req, resp))
-    resp.raise_for_status()
-    return resp
+    return self._send_api_request('DELETE', path, **kwargs)
 
   def upload(self, uri: str, filename: str, data, progress_fn=None,
              additional_headers=None):
-    """Does an UPLOAD request to the specified path"""
-    headers = {'Content-Length': str(len(data)),
-               'Content-MD5': base64.b64encode(hashlib.md5(data).digest()),
+    """Does an UPLOAD request to the specified path.
+
+    `data` can either be a `bytes` object or a binary file object, in which
+    case its content is streamed to SmugMug.
+    """
+    stream = StreamingUpload(data, progress_fn)
+    headers = {'Content-Length': str(len(stream)),
+               'Content-MD5': base64.b64encode(stream.md5()),
                'X-Smug-AlbumUri': uri,
                'X-Smug-FileName': filename,
                'X-Smug-ResponseType': 'JSON',
@@ -612,11 +827,14 @@ class SmugMug():
     headers.update(additional_headers or {})
     req = requests.Request('POST',
                            API_UPLOAD,
-                           data=StreamingUpload(data, progress_fn),
+                           data=stream,
                            headers=headers,
                            auth=self.oauth).prepare()
     resp = self._session.send(req)
     if self._requests_sent is not None:
+      # File objects get closed by the caller once uploaded, keep a copy of the
+      # body so that the request can still be inspected later on.
+      req.body = stream.getvalue()
       self._requests_sent.append((req, resp))
     resp.raise_for_status()
     return resp
@@ -1,7 +1,8 @@
 """File-system-like API for SmugMug."""
 
 import contextlib
-from typing import DefaultDict, List, Optional, Sequence, Tuple, Union
+from typing import DefaultDict, Dict, Iterator, List, Optional, Sequence
+from typing import Tuple, Union
 
 import collections
 import datetime
@@ -9,13 +10,11 @@ import glob
 import itertools
 import json
 import hashlib
+import heapq
 import os
+import threading
 from urllib import parse
 
-from hachoir.metadata import extractMetadata
-from hachoir.parser import guessParser
-from hachoir.stream import StringInputStream
-from hachoir.core import config as hachoir_config
 import jsonpath_ng
 
 from . import persistent_dict
@@ -24,10 +23,8 @@ from . import task_manager
 from . import thread_pool
 from . import thread_safe_print
 
-hachoir_config.quiet = True
-
 DEFAULT_MEDIA_EXT = ['gif', 'jpeg', 'jpg', 'mov', 'mp4', 'png', 'heic']
-VIDEO_EXT = ['mov', 'mp4']
+VIDEO_EXT = frozenset(['mov', 'mp4'])
 
 
 class Error(Exception):
@@ -56,11 +53,13 @@ class SmugMugFS():
   def __init__(self, smugmug: smugmug_lib.SmugMug) -> None:
     self._smugmug = smugmug
     self._aborting = False
+    self._mutex = threading.Lock()
 
     # Pre-compute some common variables.
-    self._media_ext = [
+    # Checked for every walked file, so keep it as a set for O(1) lookups.
+    self._media_ext = frozenset(
         ext.lower() for ext in
-        self.smugmug.config.get('media_extensions', DEFAULT_MEDIA_EXT)]
+        self.smugmug.config.get('media_extensions', DEFAULT_MEDIA_EXT))
 
   @property
   def smugmug(self) -> smugmug_lib.SmugMug:
@@ -85,9 +84,9 @@ class SmugMugFS():
     return self._match_nodes(nodes, parts)
 
   def _match_nodes(
-      self, matched_nodes: List[smugmug_lib.Node], dirs: Sequence[str]
+      self, matched_nodes: List[smugmug_lib.Node], dirs: List[str]
   ) -> Tuple[List[smugmug_lib.Node], List[str]]:
-    unmatched_dirs = collections.deque(dirs)
+    num_matched = 0
     path = ''
     for child in dirs:
       if matched_nodes[-1].node_type() == 'File':
@@ -99,8 +98,8 @@ class SmugMugFS():
         break
 
       matched_nodes.append(child_node)
-      unmatched_dirs.popleft()
-    return matched_nodes, list(unmatched_dirs)
+      num_matched += 1
+    return matched_nodes, dirs[num_matched:]
 
   def _match_or_create_nodes(
       self,
@@ -310,21 +309,19 @@ class SmugMugFS():
 
       print(f'Uploading "{filename}" to "{album}"...')
       with open(filename, 'rb') as file:
-        node.upload('Album', file_basename, file.read())
+        node.upload('Album', file_basename, file)
 
   def _get_common_path(
       self,
       matched_nodes: Sequence[smugmug_lib.Node],
       local_dirs: Sequence[str]
   ) -> Tuple[List[smugmug_lib.Node], List[str]]:
-    new_matched_nodes = []
-    unmatched_dirs = list(local_dirs)
-    for remote, local in zip(matched_nodes, unmatched_dirs):
+    num_common = 0
+    for remote, local in zip(matched_nodes, local_dirs):
       if local != remote.name:
         break
-      new_matched_nodes.append(remote)
-      unmatched_dirs.pop(0)
-    return new_matched_nodes, unmatched_dirs
+      num_common += 1
+    return list(matched_nodes[:num_common]), list(local_dirs[num_common:])
 
   def sync(self,
            user: Optional[str],
@@ -366,6 +363,13 @@ class SmugMugFS():
     self._smugmug.garbage_collector.set_max_children_cache(
         folder_threads + file_threads + 5)
 
+    # Every thread can be sending a request at the same time, keep a connection
+    # alive for each of them. Pages of long listings are prefetched in parallel
+    # by at most `folder_threads` extra requests, shared by all listings.
+    self._smugmug.set_max_connections(
+        folder_threads + file_threads + upload_threads,
+        min(folder_threads, smugmug_lib.NodeList.MAX_PARALLEL_PAGE_FETCHES))
+
     # Make sure that the source paths exist.
     globed = [(source, glob.glob(source)) for source in sources]
     not_found = [g[0] for g in globed if not g[1]]
@@ -422,32 +426,28 @@ class SmugMugFS():
       file_pool = stack.enter_context(thread_pool.ThreadPool(file_threads))
       folder_pool = stack.enter_context(thread_pool.ThreadPool(folder_threads))
 
+      # Remote nodes matching each parent folder of the albums synced so far,
+      # allowing sibling albums to skip resolving their common ancestors.
+      matched_by_parent = (
+          {})  # type: Dict[Tuple[str, ...], List[smugmug_lib.Node]]
+
       empty_list = []  # type: List[str]
       for source, walk_steps in sorted(
-          [(d, os.walk(d)) for d in dir_sources] +
+          [(d, self._walk(d)) for d in dir_sources] +
           [(p + os.sep, [(p, empty_list, f)])
            for p, f in files_by_path.items()]):
-        # Filter-out files and folders that must be ignored.
-        steps = []  # type: List[Tuple[str, List[str], List[str]]]
-        for walk_step in walk_steps:
+        # Folders are scheduled as soon as they are walked, so that syncing
+        # starts while the rest of the tree is still being listed. `_walk`
+        # yields folders in sorted order, keeping unit tests deterministic.
+        for subdir, dirs, files in walk_steps:
           if self._aborting:
             return
-          subdir, dirs, files = walk_step
+          # Filter-out files and folders that must be ignored.
           configs = persistent_dict.PersistentDict(os.path.join(subdir,
                                                                 '.smugcli'))
           ignored = set(configs.get('ignore', []))
-          dirs[:] = set(dirs) - ignored  # Prune dirs from os.walk traversal.
+          dirs[:] = set(dirs) - ignored  # Prune dirs from _walk traversal.
           files[:] = set(files) - ignored
-          steps.append((subdir, dirs, files))
-
-        # Process files in sorted order to make unit tests deterministic. We
-        # can't merge this loop with the previous one because calling `sorted`
-        # directly on the result of os.walk in `walk_step` would prevent us from
-        # pruning directories from the walk (os.walk returns a generator which
-        # can't be iterated on multiple times).
-        for walk_step in sorted(steps):
-          if self._aborting:
-            return
           folder_pool.add(self._sync_folder,
                           manager,
                           file_pool,
@@ -456,8 +456,9 @@ class SmugMugFS():
                           target,
                           privacy,
                           in_place,
-                          walk_step,
-                          matched)
+                          (subdir, dirs, files),
+                          matched,
+                          matched_by_parent)
     print('Sync complete.')
 
   def _sync_folder(self,
@@ -469,7 +470,9 @@ class SmugMugFS():
                    privacy: str,
                    in_place: bool,
                    walk_step: Tuple[str, List[str], List[str]],
-                   matched: Sequence[smugmug_lib.Node]) -> None:
+                   matched: Sequence[smugmug_lib.Node],
+                   matched_by_parent: Dict[Tuple[str, ...],
+                                           List[smugmug_lib.Node]]) -> None:
     if self._aborting:
       return
     subdir, dirs, files = walk_step
@@ -483,6 +486,9 @@ class SmugMugFS():
       if dirs:
         target_dirs.append('Images from folder ' + target_dirs[-1])
 
+      parent_dirs = tuple(target_dirs[:-1])
+      with self._mutex:
+        matched = matched_by_parent.get(parent_dirs, matched)
       matched, unmatched = self._get_common_path(matched, target_dirs)
       matched, unmatched = self._match_nodes(matched, unmatched)
 
@@ -491,6 +497,8 @@ class SmugMugFS():
             matched, unmatched, 'Album', privacy)
       else:
         print(f'Found matching remote album "{os.path.join(*target_dirs)}".')
+      with self._mutex:
+        matched_by_parent[parent_dirs] = matched[:-1]
 
       # Iterate in sorted order to make unit tests deterministic.
       for file in sorted(media_files):
@@ -514,8 +522,6 @@ class SmugMugFS():
     with manager.start_task(category=1,
                             task=f'* Syncing file "{file_path}"...'):
       file_name = file_path.split(os.sep)[-1].strip()
-      with open(file_path, 'rb') as file:
-        file_content = file.read()
       file_root, file_extension = os.path.splitext(file_name)
       if file_extension.lower() == '.heic':
         # SmugMug converts HEIC files to JPEG and renames them in the process
@@ -533,9 +539,22 @@ class SmugMugFS():
               remote_file.get_node('ImageMetadata')['DateTimeModified'],
               '%Y-%m-%dT%H:%M:%S')
 
+          # Hachoir is slow to import, so it's only loaded once a video file
+          # needs to be inspected.
+          # pylint: disable=import-outside-toplevel
+          from hachoir.core import config as hachoir_config
+          from hachoir.metadata import extractMetadata
+          from hachoir.parser import guessParser
+          from hachoir.stream import FileInputStream
+          # pylint: enable=import-outside-toplevel
+          hachoir_config.quiet = True
+
           try:
-            parser = guessParser(StringInputStream(file_content))
-            metadata = extractMetadata(parser)
+            # Let hachoir read only the container headers it needs from disk
+            # instead of parsing from an in-memory copy of the whole video.
+            with open(file_path, 'rb') as video_file:
+              parser = guessParser(FileInputStream(video_file))
+              metadata = extractMetadata(parser)
             if metadata is None:
               raise ExtractMetadataError(
                   f'Failed extracting metadata from video file "{file_path}".')
@@ -555,9 +574,14 @@ class SmugMugFS():
           # allow us to tell if the file is the same. Hence, for now we just
           # assume HEIC files never change and we never re-upload them.
           same_file = True
+        elif ('ArchivedSize' in remote_file and
+              remote_file['ArchivedSize'] != os.path.getsize(file_path)):
+          # Files of different sizes can't be identical, no need to read the
+          # whole file to compute its MD5.
+          same_file = False
         else:
           remote_md5 = remote_file['ArchivedMD5']
-          file_md5 = hashlib.md5(file_content).hexdigest()
+          file_md5 = self._get_md5(file_path)
           same_file = (remote_md5 == file_md5)
 
         if same_file:
@@ -571,16 +595,22 @@ class SmugMugFS():
                       remote_file,
                       file_path,
                       file_name,
-                      file_content,
                       in_place)
 
+  def _get_md5(self, file_path: str) -> str:
+    """Returns the MD5 hex digest of a file, reading it in chunks."""
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as file:
+      for chunk in iter(lambda: file.read(1024 * 1024), b''):
+        md5.update(chunk)
+    return md5.hexdigest()
+
   def _upload_media(self,
                     manager: task_manager.TaskManager,
                     node: smugmug_lib.Node,
                     remote_file: Union[smugmug_lib.Node, None],
                     file_path: str,
                     file_name: str,
-                    file_content: bytes,
                     in_place: bool = False) -> None:
     if self._aborting:
       return
@@ -608,15 +638,51 @@ class SmugMugFS():
         additional_headers = {
           'X-Smug-ImageUri': remote_file.uri('Image'),
         }
-      node.upload('Album', file_name, file_content,
-                  progress_fn=get_progress_fn(task),
-                  headers=additional_headers)
+      with open(file_path, 'rb') as file:
+        node.upload('Album', file_name, file,
+                    progress_fn=get_progress_fn(task),
+                    headers=additional_headers)
 
     if remote_file:
       print(f'Re-uploaded "{file_path}".')
     else:
       print(f'Uploaded "{file_path}".')
 
+  def _walk(self, top: str) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """Walks the `top` directory tree like `os.walk`, listing media files only.
+
+    Each directory is listed with a single `os.scandir` pass, using the type
+    information cached in directory entries to avoid extra stat calls. As with
+    `os.walk`, entries can be removed from the yielded `dirs` list to prune
+    them from the traversal and symbolic links to directories are not followed.
+
+    Directories are yielded in sorted path order: folders pending a visit are
+    kept in a heap and since a path always sorts before its descendants, the
+    smallest pending path is also the smallest path left to visit.
+    """
+    pending = [top]
+    while pending:
+      subdir = heapq.heappop(pending)
+      dirs = []  # type: List[str]
+      files = []  # type: List[str]
+      links = set()
+      try:
+        with os.scandir(subdir) as entries:
+          for entry in entries:
+            if entry.is_dir():
+              dirs.append(entry.name)
+              if entry.is_symlink():
+                links.add(entry.name)
+            elif self._is_media(entry.name):
+              files.append(entry.name)
+      except OSError:
+        continue
+
+      yield subdir, dirs, files
+      for name in dirs:
+        if name not in links:
+          heapq.heappush(pending, os.path.join(subdir, name))
+
   def _is_media(self, path):
     extension = os.path.splitext(path)[1][1:].lower().strip()
     return extension in self._media_ext
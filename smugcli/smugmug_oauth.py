@@ -1,20 +1,23 @@
 """SumgMug OAuth client."""
 
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
+import functools
+import shutil
 import signal
 import socket
-import subprocess
 import sys
 import threading
 from urllib import parse
-import webbrowser
 
-from dataclasses import dataclass
-import bottle
-import rauth
+from dataclasses import dataclass, field
+import requests
 import requests_oauthlib
 
+if TYPE_CHECKING:
+  import bottle
+  import rauth
+
 OAUTH_ORIGIN = 'https://secure.smugmug.com'
 REQUEST_TOKEN_URL = OAUTH_ORIGIN + '/services/oauth/1.0a/getRequestToken'
 ACCESS_TOKEN_URL = OAUTH_ORIGIN + '/services/oauth/1.0a/getAccessToken'
@@ -54,18 +57,52 @@ class AccessToken:
 
 @dataclass
 class _State:
-  running: bool
   port: int
-  app: bottle.Bottle
+  app: 'bottle.Bottle'
+  # Set once the login process completes, successfully or not.
+  done: threading.Event = field(default_factory=threading.Event)
   request_token: Optional[RequestToken] = None
   access_token: Optional[AccessToken] = None
 
 
+@functools.lru_cache(maxsize=1)
+def _is_cygwin() -> bool:
+  """Returns whether `cygstart` is available to open URLs."""
+  # Searches PATH in-process, without forking a `which` subprocess.
+  return shutil.which('cygstart') is not None
+
+
 class SmugMugOAuth():
-  """SumgMug OAuth client."""
+  """SumgMug OAuth client.
+
+  The `bottle`, `rauth`, `subprocess` and `webbrowser` modules are only needed
+  to request an access token and are imported on first use, sparing their
+  import time to the commands using an existing access token.
+  """
 
   def __init__(self, api_key: ApiKey):
-    self._service = self._create_service(api_key)
+    self._api_key = api_key
+    self._service = None  # type: Optional[rauth.OAuth1Service]
+    # Shared by all the sessions requesting tokens, so that successive
+    # requests reuse the same connection to the OAuth server.
+    self._adapter = requests.adapters.HTTPAdapter()
+
+  @property
+  def service(self) -> 'rauth.OAuth1Service':
+    """Returns the rauth service used to request access tokens."""
+    if self._service is None:
+      self._service = self._create_service(self._api_key)
+    return self._service
+
+  def _warm_up_connection(self) -> None:
+    """Opens a connection to the OAuth server, to be reused by the login."""
+    # The session isn't closed, as that would close the shared adapter.
+    session = requests.Session()
+    session.mount('https://', self._adapter)
+    try:
+      session.head(OAUTH_ORIGIN, timeout=2)
+    except requests.RequestException:
+      pass  # The login requests will simply open their own connection.
 
   def _get_free_port(self) -> int:
     sock = socket.socket()
@@ -76,33 +113,49 @@ class SmugMugOAuth():
 
   def request_access_token(self) -> AccessToken:
     """Request an OAuth access token for the SmugMug service."""
+    # pylint: disable=import-outside-toplevel
+    import subprocess
+    import webbrowser
+    from wsgiref import simple_server
+
+    import bottle
+    # pylint: enable=import-outside-toplevel
+
+    # Connect to the OAuth server while the user is busy with the browser.
+    threading.Thread(target=self._warm_up_connection, daemon=True).start()
+
     port = self._get_free_port()
-    state = _State(running=True, port=port, app=bottle.Bottle())
+    state = _State(port=port, app=bottle.Bottle())
     state.app.route('/', callback=lambda s=state: self._index(s))
     state.app.route('/callback', callback=lambda s=state: self._callback(s))
 
     def abort(signum, frame):
       del signum, frame  # Unused.
       print('SIGINT received, aborting...')
-      state.app.close()
-      state.running = False
+      state.done.set()
       sys.exit(1)
     signal.signal(signal.SIGINT, abort)
 
+    # A plain WSGI server is plenty for the two requests of the login flow and,
+    # unlike `bottle.run`, can be shut down once the flow completes.
+    server = simple_server.make_server('127.0.0.1', port, state.app)
+
     def _start_web_server() -> None:
-      bottle.run(state.app, port=port)
+      try:
+        server.serve_forever()
+      finally:
+        state.done.set()
     thread = threading.Thread(target=_start_web_server)
     thread.daemon = True
 
+    thread.start()
     try:
-      thread.start()
-
       login_url = f'http://localhost:{port}/'
       print('Started local server.')
       print(f'Visit {login_url} to grant SmugCli access to your SmugMug '
             'account.')
       print(f'Opening {login_url} in default browser...')
-      if self._is_cygwin():
+      if _is_cygwin():
         try:
           return_code = subprocess.call(['cygstart', login_url],
                                         stdout=subprocess.PIPE,
@@ -117,9 +170,13 @@ class SmugMugOAuth():
         print('Could not start default browser automatically.')
         print(f'Please visit {login_url} to complete login process.')
 
-      while state.running and thread.is_alive():
-        thread.join(1)
+      # Wake up as soon as the login completes. The wait is still done in
+      # slices since lock waits can't be interrupted by ctrl-C on Windows.
+      while not state.done.wait(1):
+        pass
     finally:
+      server.shutdown()
+      server.server_close()
       state.app.close()
 
     if state.access_token is None:
@@ -132,14 +189,22 @@ class SmugMugOAuth():
   ) -> requests_oauthlib.OAuth1:
     """Returns an OAuth1 instance."""
     return requests_oauthlib.OAuth1(
-        self._service.consumer_key,
-        self._service.consumer_secret,
+        self._api_key.key,
+        self._api_key.secret,
         resource_owner_key=access_token.token,
         resource_owner_secret=access_token.secret)
 
-  def _create_service(self, api_key: ApiKey) -> rauth.OAuth1Service:
+  def _create_service(self, api_key: ApiKey) -> 'rauth.OAuth1Service':
+    import rauth  # pylint: disable=import-outside-toplevel
+
+    def create_session(*args, **kwargs) -> rauth.OAuth1Session:
+      session = rauth.OAuth1Session(*args, **kwargs)
+      session.mount('https://', self._adapter)
+      return session
+
     return rauth.OAuth1Service(
         name='smugcli',
+        session_obj=create_session,
         consumer_key=api_key.key,
         consumer_secret=api_key.secret,
         request_token_url=REQUEST_TOKEN_URL,
@@ -149,47 +214,40 @@ class SmugMugOAuth():
 
   def _index(self, state: _State) -> None:
     """Route initiating the authorization process."""
-    request_token, request_token_secret = self._service.get_request_token(
+    import bottle  # pylint: disable=import-outside-toplevel
+    request_token, request_token_secret = self.service.get_request_token(
         params={'oauth_callback': f'http://localhost:{state.port}/callback'})
     state.request_token = RequestToken(
         token=request_token, secret=request_token_secret)
 
-    auth_url = self._service.get_authorize_url(request_token)
+    auth_url = self.service.get_authorize_url(request_token)
     auth_url = self._add_auth_params(
         auth_url, access='Full', permissions='Modify')
     bottle.redirect(auth_url)
 
   def _callback(self, state: _State) -> str:
     """Route invoked after the user completes the authorization request."""
+    import bottle  # pylint: disable=import-outside-toplevel
     if state.request_token is None:
       raise LoginError("No request token obtained.")
 
     oauth_verifier = bottle.request.query['oauth_verifier']  # type: ignore
-    (token, secret) = self._service.get_access_token(
+    (token, secret) = self.service.get_access_token(
         state.request_token.token, state.request_token.secret,
         params={'oauth_verifier': oauth_verifier})
     state.access_token = AccessToken(token, secret)
 
-    state.app.close()
-    state.running = False
+    state.done.set()
     return 'Login successful. You may close this window.'
 
   def _add_auth_params(
       self, auth_url: str, access: str, permissions: str
   ) -> str:
+    # Append the parameters to the existing query instead of decoding and
+    # re-encoding it.
     parts = parse.urlsplit(auth_url)
-    query = parse.parse_qsl(parts.query, True)
-    query.append(('Access', access))
-    query.append(('Permissions', permissions))
-    new_query = parse.urlencode(query, True)
+    params = (f'Access={parse.quote_plus(access)}&'
+              f'Permissions={parse.quote_plus(permissions)}')
+    new_query = f'{parts.query}&{params}' if parts.query else params
     return parse.urlunsplit(
         (parts.scheme, parts.netloc, parts.path, new_query, parts.fragment))
-
-  def _is_cygwin(self) -> bool:
-    try:
-      return_code = subprocess.call(['which', 'cygstart'],
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE)
-      return return_code == 0
-    except Exception:  # pylint: disable=broad-except
-      return False
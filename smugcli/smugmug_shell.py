@@ -2,7 +2,6 @@
 
 import cmd
 import shlex
-import re
 
 
 class Error(Exception):
@@ -19,7 +18,6 @@ class SmugMugShell(cmd.Cmd):
   intro = 'Welcome to the SmugMug shell.   Type help or ? to list commands.\n'
   prompt = '(smugmug) '
   file = None
-  _cmd_list_re = re.compile(r'.*\{([a-z,]+)\}', re.DOTALL)
 
   def __init__(self, fs):
     cmd.Cmd.__init__(self)
@@ -31,34 +29,41 @@ class SmugMugShell(cmd.Cmd):
     return True
 
   @classmethod
-  def set_parser(cls, parser):
-    """Configure the shell from the specified parser's commands."""
-    usage = parser.format_usage()
-    matches = SmugMugShell._cmd_list_re.match(usage)
-    if matches is None:
+  def set_parser(cls, subparsers):
+    """Configure the shell from the specified sub-command parsers.
+
+    Args:
+      subparsers: the action returned by `ArgumentParser.add_subparsers`, whose
+          sub-commands are exposed as shell commands.
+    """
+    if not subparsers.choices:
       raise InitializationError(
           'Failed creating shell commands from `smugcli` parser.')
-    commands = matches.group(1).split(',')
 
-    def do_handler(command):
+    def split_args(args):
+      # Only use the shell-like tokenizer if the arguments need it.
+      if '"' in args or "'" in args or '\\' in args:
+        return shlex.split(args)
+      return args.split()
+
+    def do_handler(parser):
       def handler(self, args):
         del self  # Unused.
         try:
-          parsed = parser.parse_args([command] + shlex.split(args))
+          parsed = parser.parse_args(split_args(args))
           parsed.func(parsed)
         except Exception as exc:  # pylint: disable=broad-except
           print(f'Command failed: {exc}')
       return handler
 
-    def help_handler(command):
+    def help_handler(parser):
       def handler(self):
         del self  # Unused.
-        try:
-          parser.parse_args([command, '--help'])
-        except Exception as exc:  # pylint: disable=broad-except
-          print(f'Command failed: {exc}')
+        parser.print_help()
       return handler
 
-    for command in commands:
-      setattr(cls, 'do_' + command, do_handler(command))
-      setattr(cls, 'help_' + command, help_handler(command))
+    # Each command is dispatched directly to its own parser, skipping the
+    # top-level parser.
+    for command, parser in list(subparsers.choices.items()):
+      setattr(cls, 'do_' + command, do_handler(parser))
+      setattr(cls, 'help_' + command, help_handler(parser))
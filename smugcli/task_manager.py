@@ -1,8 +1,10 @@
 """Context manager replacing global stdout & maintain task status on screen."""
 
-import collections
+from typing import Dict, List, Optional, Set, Tuple  # noqa: F401
+
+import bisect
 import os
-import platform
+import signal
 import sys
 import time
 import threading
@@ -10,10 +12,13 @@ import threading
 from . import stdout_interceptor
 from . import terminal_size
 
-if platform.system() == 'Windows':
+if os.name == 'nt':
   import colorama  # pylint: disable=import-error
   colorama.init()
 
+# Clears the end of a terminal line before moving to the next line.
+_ENDLINE = '\033[K' + os.linesep
+
 
 class Task():
   """Context manager maintaining a task status on screen until it exits."""
@@ -109,27 +114,135 @@ class TaskManager(stdout_interceptor.StdoutInterceptor):
     Foo
   """
 
+  # Minimum delay between two repaints. Text written and status updates
+  # arriving faster than this are buffered and coalesced into a single
+  # deferred repaint.
+  STATUS_REFRESH_PERIOD = 0.05
+
+  # Buffered text is written out right away once it grows past this size.
+  MAX_BUFFERED_CHARS = 4096
+
+  # Delay after which the terminal size is queried again. Resizes are also
+  # picked up immediately on platforms supporting SIGWINCH.
+  TERMINAL_SIZE_TTL = 1.0
+
   def __init__(self):
     super().__init__()
-    self._tasks_in_progress = collections.defaultdict(dict)
+    self._tasks_in_progress = {}  # type: Dict[int, Dict[str, str]]
+    # Categories and task names kept in sorted order as tasks start and
+    # complete, sparing a sort of all tasks on every repaint.
+    self._sorted_categories = []  # type: List[int]
+    self._sorted_tasks = {}  # type: Dict[int, List[str]]
     self._mutex = threading.RLock()
-    self._last_update_time = 0
+    self._last_update_time = 0.0
+    self._dirty = False
+    # Deferred repaints are done by a single long-lived thread, woken up through
+    # this condition when the status gets dirty.
+    self._refresh_cv = threading.Condition(self._mutex)
+    self._refresh_thread = None  # type: Optional[threading.Thread]
+    self._stopping = False
+    self._write_buffer = []  # type: List[str]
+    self._buffered_chars = 0
+    self._terminal_width = 0
+    self._terminal_width_expiry = 0.0
+    self._original_sigwinch_handler = None
+    # Incremented on every task change, used to know when the cached status
+    # string must be rebuilt.
+    self._status_version = 0
+    self._status_cache_key = None  # type: Optional[Tuple[int, int]]
+    self._status_cache = ''
+    # Row of each task's status line, relative to the first status line, as
+    # of the last full repaint. While the set of tasks is unchanged, status
+    # updates only repaint the rows of the tasks that changed.
+    self._task_rows = {}  # type: Dict[Tuple[int, str], int]
+    self._task_rows_width = 0
+    self._layout_changed = True
+    self._changed_tasks = set()  # type: Set[Tuple[int, str]]
+
+  def __enter__(self):
+    """Replaces global stdout and starts printing status after last write."""
+    # Signal handlers can only be installed from the main thread.
+    if (hasattr(signal, 'SIGWINCH') and
+        threading.current_thread() is threading.main_thread()):
+      self._original_sigwinch_handler = signal.signal(
+          signal.SIGWINCH,  # pylint: disable=no-member
+          self._on_terminal_resize)
+    self._stopping = False
+    return super().__enter__()
 
   def __exit__(self, exc_type, exc_value, traceback) -> None:
     """Terminate this TaskManager and restore global stdout."""
+    with self._mutex:
+      self._stopping = True
+      self._refresh_cv.notify()
+      refresh_thread = self._refresh_thread
+      self._refresh_thread = None
+      if self._write_buffer:
+        self._flush()
+      self._dirty = False
+    if refresh_thread is not None:
+      refresh_thread.join()
     super().__exit__(exc_type, exc_value, traceback)
     sys.stdout.write('\033[J')
+    if self._original_sigwinch_handler is not None:
+      signal.signal(signal.SIGWINCH,  # pylint: disable=no-member
+                    self._original_sigwinch_handler)
+      self._original_sigwinch_handler = None
+
+  def _on_terminal_resize(self, signum, frame) -> None:
+    del signum, frame  # Unused.
+    self._terminal_width_expiry = 0.0
+
+  def _get_terminal_width(self) -> int:
+    """Returns the terminal width, only querying the terminal periodically."""
+    now = time.monotonic()
+    if now >= self._terminal_width_expiry:
+      self._terminal_width = terminal_size.get_terminal_size()[0]
+      self._terminal_width_expiry = now + self.TERMINAL_SIZE_TTL
+    return self._terminal_width
 
   def write(self, string: str) -> None:
-    """Erase previous status, prints the specified text and re-print status."""
-    # Clear the end of each terminal lines before moving to the next line.
-    endline = '\033[K' + os.linesep
-    string = endline.join(string.split(os.linesep))
+    """Erase previous status, prints the specified text and re-print status.
+
+    Writes closely following the previous repaint are buffered and written out
+    together, with a single status repaint, once `STATUS_REFRESH_PERIOD` has
+    elapsed.
+    """
+    if os.linesep != '\n':
+      # `print` writes '\n' line endings whatever the platform.
+      string = string.replace(os.linesep, '\n')
+    string = string.replace('\n', _ENDLINE)
 
     with self._mutex:
-      super().stdout.write(string + self.get_status_string())
-      super().stdout.flush()
-      self._last_update_time = time.time()
+      self._write_buffer.append(string)
+      self._buffered_chars += len(string)
+      if self._buffered_chars > self.MAX_BUFFERED_CHARS:
+        self._flush()
+      else:
+        self._status_changed()
+
+  def flush(self) -> None:
+    """Write out buffered text and re-print status."""
+    with self._mutex:
+      self._flush()
+
+  def _flush(self) -> None:
+    if (self._write_buffer or self._layout_changed or
+        self._get_terminal_width() - 1 != self._task_rows_width):
+      self._write_buffer.append(self.get_status_string())
+      self._layout_changed = False
+    else:
+      self._write_buffer.append(self._get_changed_rows_string())
+    self._changed_tasks.clear()
+    output = ''.join(self._write_buffer)
+    if output:
+      stdout = self.stdout
+      stdout.write(output)
+      stdout.flush()
+    self._write_buffer.clear()
+    self._buffered_chars = 0
+    self._last_update_time = time.monotonic()
+    self._dirty = False
 
   def start_task(self, category: int, task: str, status: str = '') -> Task:
     """Start a task whose status string will be maintained on screen."""
@@ -140,47 +253,132 @@ class TaskManager(stdout_interceptor.StdoutInterceptor):
   ) -> None:
     """Update the status of a task"""
     with self._mutex:
-      self._tasks_in_progress[category][task] = status
-      if time.time() > self._last_update_time + 0.05:
-        self.print_status()
+      tasks = self._tasks_in_progress.get(category)
+      if tasks is None:
+        bisect.insort(self._sorted_categories, category)
+        tasks = self._tasks_in_progress[category] = {}
+        self._sorted_tasks[category] = []
+      if task in tasks:
+        self._changed_tasks.add((category, task))
+      else:
+        bisect.insort(self._sorted_tasks[category], task)
+        self._layout_changed = True
+      tasks[task] = status
+      self._status_version += 1
+      self._status_changed()
 
   def task_completed(self, category: int, task: str) -> None:
     """Mark a task as complete and stop printing its status."""
     with self._mutex:
-      del self._tasks_in_progress[category][task]
-      if not self._tasks_in_progress[category]:
+      tasks = self._tasks_in_progress.get(category)
+      if tasks is None or tasks.pop(task, None) is None:
+        return  # Already completed.
+      sorted_tasks = self._sorted_tasks[category]
+      del sorted_tasks[bisect.bisect_left(sorted_tasks, task)]
+      self._status_version += 1
+      self._layout_changed = True
+      if not tasks:
         del self._tasks_in_progress[category]
+        del self._sorted_tasks[category]
+        self._sorted_categories.remove(category)
         self.print_status()
+      else:
+        self._status_changed()
+
+  def _status_changed(self) -> None:
+    """Repaint now, or later if the last repaint happened too recently."""
+    delay = (self._last_update_time + self.STATUS_REFRESH_PERIOD -
+             time.monotonic())
+    if delay < 0:
+      self._flush()
+      return
+
+    if not self._dirty:
+      self._dirty = True
+      if self._refresh_thread is None:
+        self._refresh_thread = threading.Thread(target=self._refresh_status,
+                                                daemon=True)
+        self._refresh_thread.start()
+      else:
+        self._refresh_cv.notify()
+
+  def _refresh_status(self) -> None:
+    """Repaints text and status changes once the refresh period elapsed."""
+    with self._mutex:
+      while not self._stopping:
+        if not self._dirty:
+          self._refresh_cv.wait()
+          continue
+        delay = (self._last_update_time + self.STATUS_REFRESH_PERIOD -
+                 time.monotonic())
+        if delay > 0:
+          self._refresh_cv.wait(delay)
+        else:
+          self._flush()
 
   def get_status_string(self) -> str:
     """Generate a string containing all tasks' status."""
-    terminal_width = terminal_size.get_terminal_size()[0] - 1
-
-    # Clear the end of each console line before moving to the next line.
-    endline = '\033[K' + os.linesep
+    terminal_width = self._get_terminal_width() - 1
 
     with self._mutex:
-      text = (
-          endline +
-          (endline * 2).join(
-              endline.join(self.clip_long_line(f'{t}{s}', terminal_width)
-                           for t, s in sorted(tasks.items()))
-              for _, tasks in sorted(self._tasks_in_progress.items())) +
-          endline)
-
-      # Print the status text, clear the remaining of the console and move
-      # the cursor up to the first status line, ready for the next print.
-      return text + '\033[J' + f'\033[{len(text.split(os.linesep))-1}A\r'
+      cache_key = (self._status_version, terminal_width)
+      if cache_key != self._status_cache_key:
+        # One line per task, with categories separated by an empty line, all
+        # preceded by an empty line.
+        clip_prefix = terminal_width * 5 // 8
+        lines = ['']
+        self._task_rows.clear()
+        for category in self._sorted_categories:
+          tasks = self._tasks_in_progress[category]
+          if len(lines) > 1:
+            lines.append('')
+          for task in self._sorted_tasks[category]:
+            self._task_rows[(category, task)] = len(lines)
+            lines.append(self.clip_long_line(
+                f'{task}{tasks[task]}', terminal_width, clip_prefix))
+        self._task_rows_width = terminal_width
+        if len(lines) == 1:
+          lines.append('')
+
+        # Print the status text, clear the remaining of the console and move
+        # the cursor up to the first status line, ready for the next print.
+        self._status_cache = (_ENDLINE.join(lines) + _ENDLINE + '\033[J' +
+                              f'\033[{len(lines)}A\r')
+        self._status_cache_key = cache_key
+      return self._status_cache
+
+  def _get_changed_rows_string(self) -> str:
+    """Generate a string only repainting the status of changed tasks.
+
+    Only valid while the tasks are those of the last full repaint. The cursor
+    is left on the first status line, as `get_status_string` leaves it.
+    """
+    terminal_width = self._task_rows_width
+    clip_prefix = terminal_width * 5 // 8
+    rows = []
+    for category, task in self._changed_tasks:
+      row = self._task_rows[(category, task)]
+      line = self.clip_long_line(
+          f'{task}{self._tasks_in_progress[category][task]}',
+          terminal_width, clip_prefix)
+      rows.append(f'\033[{row}B{line}\033[K\033[{row}A\r')
+    return ''.join(rows)
 
   def print_status(self) -> None:
     """Refresh the status in the shell."""
-    self.write('')
-
-  def clip_long_line(self, string: str, max_length: int) -> str:
-    """Clip long lines to `max_length` by replacing a section with '...'."""
-    if len(string) > max_length:
-      clipped = '...'
-      prefix = int(max_length * 5 / 8)
-      suffix = len(string) - (max_length - prefix - len(clipped))
-      return string[:prefix] + clipped + string[suffix:]
-    return string
+    self.flush()
+
+  def clip_long_line(
+      self, string: str, max_length: int, prefix: Optional[int] = None
+  ) -> str:
+    """Clip long lines to `max_length` by replacing a section with '...'.
+
+    `prefix` is the number of leading characters kept, defaulting to 5/8th of
+    `max_length`. Callers clipping many lines can compute it once.
+    """
+    if len(string) <= max_length:
+      return string
+    if prefix is None:
+      prefix = max_length * 5 // 8
+    suffix = len(string) - (max_length - prefix - 3)
+    return f'{string[:prefix]}...{string[suffix:]}'
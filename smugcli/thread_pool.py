@@ -2,7 +2,31 @@
 
 import queue
 import threading
-import time
+
+
+class _TaskQueue:
+  """Bounded FIFO queue of tasks.
+
+  Built on the C implemented `queue.SimpleQueue`, with a semaphore bounding
+  the number of queued tasks. Unlike `queue.Queue`, it doesn't keep track of
+  unfinished tasks, which `ThreadPool` already counts.
+  """
+
+  def __init__(self, maxsize: int) -> None:
+    self._queue = queue.SimpleQueue()
+    self._slots = threading.Semaphore(maxsize)
+
+  def put(self, task) -> None:
+    """Add a task to the queue, blocking while the queue is full."""
+    # The slot is released by `get`, once the task leaves the queue.
+    self._slots.acquire()  # pylint: disable=consider-using-with
+    self._queue.put(task)
+
+  def get(self):
+    """Remove and return a task from the queue, blocking until one is ready."""
+    task = self._queue.get()
+    self._slots.release()
+    return task
 
 
 class Worker(threading.Thread):
@@ -15,29 +39,30 @@ class Worker(threading.Thread):
 
   def run(self):
     while True:
-      try:
-        func, args, kwargs = self._task_queue.get(timeout=1)
-        try:
-          if func:
-            func(*args, **kwargs)
-        except Exception as exc:  # pylint: disable=broad-except
-          print(str(exc))
-        finally:
-          self._task_queue.task_done()
-      except queue.Empty:
-        pass
-
-      if self._thread_pool.aborting:
+      # Block until a task arrives: `ThreadPool` wakes up idle workers with
+      # a `None` task when stopping.
+      func, args, kwargs = self._task_queue.get()
+      if func is None:
         return
+      try:
+        func(*args, **kwargs)
+      except Exception as exc:  # pylint: disable=broad-except
+        print(str(exc))
+      finally:
+        self._thread_pool.task_done()
 
 
 class ThreadPool:
   """Pool of threads consuming tasks from a queue"""
 
   def __init__(self, num_threads: int) -> None:
-    self._tasks = queue.Queue(num_threads)
+    self._tasks = _TaskQueue(num_threads)
     self._threads = []
     self._aborting = False
+    # Number of tasks added and not yet completed, notified by workers when it
+    # drops to zero.
+    self._pending = 0
+    self._done_cv = threading.Condition()
     for _ in range(num_threads):
       worker = Worker(self, self._tasks)
       worker.daemon = True
@@ -57,32 +82,38 @@ class ThreadPool:
       args: argument list for `func`.
       kwargs: keyword arguments for `func`.
     """
+    with self._done_cv:
+      self._pending += 1
     self._tasks.put((callback, args, kwargs))
 
+  def task_done(self) -> None:
+    """Called by workers once they are done executing a task."""
+    with self._done_cv:
+      self._pending -= 1
+      if not self._pending:
+        self._done_cv.notify_all()
+
   def join(self) -> None:
     """Wait for all the tasks to be executed in the thread pool."""
 
-    # Busy-loop instead of using 'join' to allow for ctrl-C interrupts.
-    while not self._tasks.empty():
-      time.sleep(1)
+    # Wait in slices to allow for ctrl-C interrupts.
+    with self._done_cv:
+      while self._pending:
+        self._done_cv.wait(timeout=0.2)
 
     self._stop_workers()
 
     # Wait for all threads to quit.
     for thread in self._threads:
-      while thread.is_alive():
-        thread.join(1)
+      thread.join()
 
   def _stop_workers(self, signum=None, frame=None):
     del signum, frame  # Unused.
     self._aborting = True
 
-    # Wake up any remaining blocked threads.
+    # Wake up the blocked threads, each of them exiting on its `None` task.
     for _ in self._threads:
-      try:
-        self._tasks.put((None, None, None), block=False)
-      except queue.Full:
-        pass
+      self._tasks.put((None, None, None))
 
   def __enter__(self):
     return self
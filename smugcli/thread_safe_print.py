@@ -4,7 +4,6 @@ are written atomically. This ensures that two lines printed by two different
 threads won't be printed entangled with each other.
 """
 
-import io
 import os
 import threading
 
@@ -29,27 +28,34 @@ class ThreadSafePrint(stdout_interceptor.StdoutInterceptor):
 
   def write(self, string):
     """Write a string to stdout."""
-    if not hasattr(thread_local, 'stdout'):
-      thread_local.stdout = io.StringIO()
-    stdout = thread_local.stdout
-
-    stdout.write(string.decode('utf-8')
-                 if isinstance(string, bytes) else string)
-    stdout.seek(0)
-    lines = stdout.readlines()
-    stdout.seek(0)
-    stdout.truncate()
+    if isinstance(string, bytes):
+      string = string.decode('utf-8')
+
+    # Text not yet terminated by a line break is kept in a per-thread list of
+    # chunks, which only gets joined once the line is complete.
+    chunks = getattr(thread_local, 'chunks', None)
+    if chunks is None:
+      chunks = thread_local.chunks = []
+    if '\n' not in string and '\r' not in string:
+      chunks.append(string)
+      return
+
+    chunks.append(string)
+    lines = ''.join(chunks).split('\n')
+    chunks.clear()
+    remainder = lines.pop()
+    # There is a strange bug where if multiple threads print at the same time,
+    # some of the printed lines get prefixed with a white space. I could not
+    # find where that space is coming from, so I'm stripping it away for now.
+    output = ''.join(line.strip() + os.linesep for line in lines)
+    flush = '\r' in remainder
+    if flush:
+      output += remainder
+    elif remainder:
+      chunks.append(remainder)
+
     with self._mutex:
-      for line in lines:
-        if '\n' in line:
-          # There is a strange bug where if multiple threads print at the same
-          # time, some of the printed lines get prefixed with a white space. I
-          # could not find where that space is coming from, so I'm stripping it
-          # away for now.
-          super().stdout.write(line.strip() + os.linesep)
-        elif '\r' in line:
-          super().stdout.write(line)
-          super().stdout.flush()
-        else:
-          stdout.write(line)
-          break
+      stdout = self.stdout
+      stdout.write(output)
+      if flush:
+        stdout.flush()
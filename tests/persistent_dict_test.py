@@ -105,6 +105,21 @@ class TestPersistentDict(unittest.TestCase):
     with open(filename, encoding=locale.getpreferredencoding()) as handle:
       self.assertEqual(json.load(handle), {'b': 20})
 
+  def test_read_only_methods_do_not_save(self):
+    """Tests that reading from the dict doesn't rewrite it to disk."""
+    filename = path.join(self._test_dir, 'my_file')
+    with open(filename, 'w', encoding=locale.getpreferredencoding()) as handle:
+      handle.write('{"a": {"b": [1]}}')
+    pdict = persistent_dict.PersistentDict(filename)
+    self.assertEqual(pdict.get('a').get('b').count(1), 1)
+    self.assertEqual(list(pdict.keys()), ['a'])
+    with open(filename, encoding=locale.getpreferredencoding()) as handle:
+      self.assertEqual(handle.read(), '{"a": {"b": [1]}}')
+
+    pdict.get('a').get('b').append(2)
+    with open(filename, encoding=locale.getpreferredencoding()) as handle:
+      self.assertEqual(json.load(handle), {'a': {'b': [1, 2]}})
+
 
 if __name__ == '__main__':
   unittest.main()
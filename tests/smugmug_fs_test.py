@@ -5,8 +5,10 @@ import json
 import locale
 import os
 import sys
+import tempfile
 import unittest
 
+import mock
 from parameterized import parameterized
 import responses
 
@@ -187,6 +189,53 @@ class TestSmugMugFS(unittest.TestCase):
         self._cmd_output.getvalue(),
         os.path.normpath(expected_message))
 
+  def test_walk(self):
+    """Tests the `_walk` method."""
+    with tempfile.TemporaryDirectory() as root:
+      os.makedirs(os.path.join(root, 'album', 'ignored'))
+      os.makedirs(os.path.join(root, 'folder', 'sub album'))
+      os.makedirs(os.path.join(root, 'folder-2'))
+      for file in (('image.jpg',),
+                   ('notes.txt',),
+                   ('album', 'video.MOV'),
+                   ('album', 'ignored', 'image.jpg'),
+                   ('folder', 'sub album', 'image.png'),
+                   ('folder-2', 'image.gif')):
+        with open(os.path.join(root, *file), 'wb'):
+          pass
+
+      steps = []
+      walk = self._fs._walk(root)  # pylint: disable=protected-access
+      for subdir, dirs, files in walk:
+        dirs.sort()
+        if 'ignored' in dirs:
+          dirs.remove('ignored')
+        steps.append((os.path.relpath(subdir, root), list(dirs), files))
+
+    self.assertEqual(
+        steps,
+        [('.', ['album', 'folder', 'folder-2'], ['image.jpg']),
+         ('album', [], ['video.MOV']),
+         ('folder', ['sub album'], []),
+         ('folder-2', [], ['image.gif']),
+         (os.path.join('folder', 'sub album'), [], ['image.png'])])
+
+  @responses.activate
+  def test_sync_file_skips_md5_when_sizes_differ(self):
+    """Tests that `_sync_file` doesn't hash files of a different size."""
+    album_node = self._fs.get_root_node('cmac').get_child(
+        'Photography').get_child('San Francisco by helicopter 2014')
+    upload_pool = mock.Mock()
+    with tempfile.TemporaryDirectory() as root:
+      file_path = os.path.join(root, 'DSC_5752.jpg')
+      with open(file_path, 'wb') as file:
+        file.write(b'Local content')
+      with mock.patch.object(self._fs, '_get_md5') as get_md5:
+        self._fs._sync_file(  # pylint: disable=protected-access
+            mock.MagicMock(), file_path, album_node, upload_pool)
+    get_md5.assert_not_called()
+    upload_pool.add.assert_called_once()
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -1,8 +1,12 @@
 """Unit test for smugmug.py"""
 
+import io
+import threading
+import time
 import unittest
 
 import freezegun
+import mock
 
 from smugcli import smugmug
 
@@ -97,3 +101,230 @@ class TestChildCacheGarbageCollector(unittest.TestCase):
     self.assertEqual(nodes[0].reset_count, 1)
     self.assertEqual(nodes[1].reset_count, 1)
     self.assertEqual(nodes[2].reset_count, 0)
+
+
+class TestNodeList(unittest.TestCase):
+  """Test for `smugmug.NodeList`."""
+
+  def _page_json(self, start, count, total):
+    uri = f'/api/v2/node/root!children?start={start}&count={count}'
+    names = [f'Node {i}' for i in range(start - 1,
+                                        min(start - 1 + count, total))]
+    return {'Response': {
+        'Uri': uri,
+        'Locator': 'Node',
+        'Pages': {'Count': count, 'Total': total},
+        'Node': [{'Name': name} for name in names]}}
+
+  def test_iteration_fetches_each_page_once(self):
+    """Tests iterating over nodes spanning multiple pages."""
+    smugmug_obj = smugmug.FakeSmugMug()
+    get_json = mock.Mock(side_effect=lambda uri: self._page_json(
+        int(uri.split('start=')[1].split('&')[0]), 2, 5))
+    smugmug_obj.get_json = get_json
+    node_list = smugmug.NodeList(smugmug_obj, self._page_json(1, 2, 5), None)
+
+    self.assertEqual([node.name for node in node_list],
+                     [f'Node {i}' for i in range(5)])
+    self.assertEqual(get_json.call_count, 2)
+    self.assertEqual(node_list[3].name, 'Node 3')
+    self.assertEqual(get_json.call_count, 2)
+
+  def test_iteration_raises_page_fetch_errors(self):
+    """Tests that errors fetching a page are raised when reaching it."""
+    smugmug_obj = smugmug.FakeSmugMug()
+    smugmug_obj.get_json = mock.Mock(side_effect=ValueError('Failed'))
+    node_list = smugmug.NodeList(smugmug_obj, self._page_json(1, 2, 5), None)
+
+    nodes = iter(node_list)
+    self.assertEqual(next(nodes).name, 'Node 0')
+    self.assertEqual(next(nodes).name, 'Node 1')
+    with self.assertRaises(ValueError):
+      next(nodes)
+
+  def test_pages_are_fetched_inline_if_limited_to_one_fetch(self):
+    """Tests that no thread is started to fetch pages one at a time."""
+    smugmug_obj = smugmug.FakeSmugMug()
+    smugmug_obj.set_max_connections(1, 1)
+    fetching_threads = set()
+
+    def get_json(uri):
+      fetching_threads.add(threading.current_thread())
+      return self._page_json(int(uri.split('start=')[1].split('&')[0]), 2, 5)
+
+    smugmug_obj.get_json = get_json
+    node_list = smugmug.NodeList(smugmug_obj, self._page_json(1, 2, 5), None)
+
+    self.assertEqual(len(list(node_list)), 5)
+    self.assertEqual(fetching_threads, {threading.current_thread()})
+
+  def test_page_fetches_are_bounded_across_lists(self):
+    """Tests that all lists share the same page fetch limit."""
+    smugmug_obj = smugmug.FakeSmugMug()
+    smugmug_obj.set_max_connections(1, 2)
+    lock = threading.Lock()
+    fetches = {'current': 0, 'max': 0}
+
+    def get_json(uri):
+      with lock:
+        fetches['current'] += 1
+        fetches['max'] = max(fetches['max'], fetches['current'])
+      time.sleep(0.01)
+      with lock:
+        fetches['current'] -= 1
+      return self._page_json(int(uri.split('start=')[1].split('&')[0]), 1, 5)
+
+    smugmug_obj.get_json = get_json
+    node_lists = [
+        smugmug.NodeList(smugmug_obj, self._page_json(1, 1, 5), None)
+        for _ in range(3)]
+    threads = [threading.Thread(target=list, args=(node_list,))
+               for node_list in node_lists]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(fetches['max'], 2)
+
+
+class TestNode(unittest.TestCase):
+  """Test for `smugmug.Node`."""
+
+  def test_delete_removes_node_from_children_cache(self):
+    """Tests that deleted nodes are no longer returned as children."""
+    smugmug_obj = smugmug.FakeSmugMug()
+    children = {}
+    folder = smugmug.Node(smugmug_obj, {'Type': 'Folder', 'Name': 'folder'},
+                          child_nodes_by_name=children)
+    album = smugmug.Node(smugmug_obj, {'Type': 'Album', 'Name': 'album',
+                                       'Uri': '/api/v2/node/album'},
+                         parent=folder)
+    children['album'] = [album]
+
+    with mock.patch.object(smugmug_obj, 'delete') as delete:
+      album.delete()
+
+    delete.assert_called_once_with('/api/v2/node/album')
+    self.assertIsNone(folder.get_child('album'))
+
+  def test_get_or_create_child_coalesces_concurrent_creations(self):
+    """Tests that a child being created is not created a second time."""
+    smugmug_obj = smugmug.FakeSmugMug()
+    children = {}
+    folder = smugmug.Node(smugmug_obj, {'Type': 'Folder', 'Name': 'folder'},
+                          child_nodes_by_name=children)
+    creating = threading.Event()
+    resume = threading.Event()
+    created = []
+
+    def create_child_node(node, name, node_type, privacy):
+      del node, privacy  # Unused.
+      creating.set()
+      resume.wait()
+      child = smugmug.Node(smugmug_obj, {'Type': node_type, 'Name': name},
+                           parent=folder, child_nodes_by_name={})
+      created.append(child)
+      children[name] = [child]
+      return child
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            folder.get_or_create_child('Album', 'Album', 'Public')))
+        for _ in range(3)]
+    with mock.patch.object(smugmug.Node, '_create_child_node',
+                           create_child_node):
+      threads[0].start()
+      creating.wait()
+      for thread in threads[1:]:
+        thread.start()
+      resume.set()
+      for thread in threads:
+        thread.join()
+
+    self.assertEqual(len(created), 1)
+    self.assertEqual(len(results), 3)
+    self.assertTrue(all(result is created[0] for result in results))
+
+  def test_get_or_create_child_creates_siblings_concurrently(self):
+    """Tests that distinct children are created in parallel."""
+    smugmug_obj = smugmug.FakeSmugMug()
+    children = {}
+    folder = smugmug.Node(smugmug_obj, {'Type': 'Folder', 'Name': 'folder'},
+                          child_nodes_by_name=children)
+    # Both creations must be in flight at the same time to get past this
+    # barrier, which would time out if the parent's lock was held.
+    both_creating = threading.Barrier(2, timeout=5)
+
+    def create_child_node(node, name, node_type, privacy):
+      del node, privacy  # Unused.
+      both_creating.wait()
+      child = smugmug.Node(smugmug_obj, {'Type': node_type, 'Name': name},
+                           parent=folder, child_nodes_by_name={})
+      children[name] = [child]
+      return child
+
+    results = {}
+    errors = []
+
+    def create(name):
+      try:
+        results[name] = folder.get_or_create_child(name, 'Album', 'Public')
+      except threading.BrokenBarrierError as exc:
+        errors.append(exc)
+
+    threads = [threading.Thread(target=create, args=(name,))
+               for name in ('Album 1', 'Album 2')]
+    with mock.patch.object(smugmug.Node, '_create_child_node',
+                           create_child_node):
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+
+    self.assertEqual(errors, [])
+    self.assertEqual(results['Album 1'].name, 'Album 1')
+    self.assertEqual(results['Album 2'].name, 'Album 2')
+
+
+class TestStreamingUpload(unittest.TestCase):
+  """Test for `smugmug.StreamingUpload`."""
+
+  def test_getvalue_starts_at_initial_position(self):
+    """Tests that only the data being uploaded is returned."""
+    data = io.BytesIO(b'skipped, uploaded')
+    data.seek(len(b'skipped, '))
+    stream = smugmug.StreamingUpload(data, None)
+    self.assertEqual(stream.read(4), b'uplo')
+    self.assertEqual(stream.getvalue(), b'uploaded')
+    self.assertEqual(stream.read(), b'aded')
+
+
+class TestSmugMug(unittest.TestCase):
+  """Test for `smugmug.SmugMug`."""
+
+  def test_logout_forgets_cached_credentials(self):
+    """Tests that requests are no longer signed once logged out."""
+    smugmug_obj = smugmug.SmugMug(
+        {'api_key': ('key', 'secret'), 'access_token': ('token', 'secret')})
+    self.assertIsNotNone(smugmug_obj.oauth)
+
+    smugmug_obj.logout()
+    with mock.patch('builtins.print'):
+      with self.assertRaises(smugmug.NotLoggedInError):
+        smugmug_obj.oauth  # pylint: disable=pointless-statement
+
+  def test_set_max_connections_closes_replaced_pool(self):
+    """Tests that resizing the connection pool closes the previous one."""
+    smugmug_obj = smugmug.SmugMug({})
+    session = smugmug_obj._session  # pylint: disable=protected-access
+    adapter = session.adapters['https://']
+    with mock.patch.object(adapter, 'close') as close:
+      smugmug_obj.set_max_connections(20)
+    close.assert_called_once_with()
+    resized_adapter = session.adapters['https://']
+    self.assertIsNot(resized_adapter, adapter)
+
+    smugmug_obj.set_max_connections(20)
+    self.assertIs(session.adapters['https://'], resized_adapter)
@@ -1,12 +1,15 @@
 """Unit test for task_manager.py."""
 
 import datetime
+import io
 import itertools
 import sys
+import time
 from typing import Sequence
 import unittest
 
 import freezegun
+import mock
 from parameterized import parameterized
 
 import io_expectation as expect
@@ -21,6 +24,7 @@ class TaskManagerTests(unittest.TestCase):
     expect_escape = expect.Regex(r'\033\[J|'
                                  r'\033\[K|'
                                  r'\033\[\d+A|'
+                                 r'\033\[\d+B|'
                                  r'\n|'
                                  r'\r').repeatedly()
     return expect.InOrder([expect_escape] +
@@ -44,6 +48,48 @@ class TaskManagerTests(unittest.TestCase):
     expected_io.assert_output_was(self.except_status(['Some task',
                                                       'Some task: 50%']))
 
+  def test_throttled_update_is_printed_later(self):
+    """Tests that status updates arriving too fast are eventually printed."""
+    expected_io = expect.ExpectedInputOutput()
+    sys.stdout = expected_io
+    with task_manager.TaskManager() as manager:
+      with manager.start_task(category=0, task='Some task') as task:
+        task.update_status(': 50%')
+        expected_io.assert_output_was(self.except_status(['Some task']))
+
+        time.sleep(task_manager.TaskManager.STATUS_REFRESH_PERIOD * 4)
+        expected_io.assert_output_was(self.except_status(['Some task: 50%']))
+
+  def test_throttled_updates_share_one_refresh_thread(self):
+    """Tests that deferred repaints don't each start a new thread."""
+    output = io.StringIO()
+    sys.stdout = output
+    with mock.patch.object(task_manager.threading, 'Thread',
+                           wraps=task_manager.threading.Thread) as thread:
+      with task_manager.TaskManager() as manager:
+        with manager.start_task(category=0, task='Some task') as task:
+          for percent in range(5):
+            task.update_status(f': {percent}%')
+            task.update_status(f': {percent}.5%')
+            time.sleep(task_manager.TaskManager.STATUS_REFRESH_PERIOD * 2)
+          self.assertIn('Some task: 4.5%', output.getvalue())
+    self.assertEqual(thread.call_count, 1)
+
+  def test_writes_are_coalesced(self):
+    """Tests that text printed right after a repaint is written later."""
+    output = io.StringIO()
+    sys.stdout = output
+    with freezegun.freeze_time('2019-01-01 12:00:00') as frozen_time:
+      with task_manager.TaskManager() as manager:
+        with manager.start_task(category=0, task='Some task') as task:
+          print('Foo')
+          print('Bar')
+          self.assertNotIn('Foo', output.getvalue())
+
+          frozen_time.tick(delta=datetime.timedelta(milliseconds=100))
+          task.update_status(': 50%')
+          self.assertRegex(output.getvalue(), '(?s)Foo.*Bar.*Some task: 50%')
+
   def test_task_groups(self):
     """Test task grouping."""
     expected_io = expect.ExpectedInputOutput()
@@ -60,17 +106,58 @@ class TaskManagerTests(unittest.TestCase):
 
             frozen_time.tick(delta=datetime.timedelta(milliseconds=100))
             task0.update_status(': 50%')
-            expected_io.assert_output_was(self.except_status(['Task 0: 50%',
-                                                              'Task 1']))
+            expected_io.assert_output_was(self.except_status(['Task 0: 50%']))
 
             frozen_time.tick(delta=datetime.timedelta(milliseconds=100))
             task1.update_status(': 75%')
-            expected_io.assert_output_was(self.except_status(['Task 0: 50%',
-                                                              'Task 1: 75%']))
+            expected_io.assert_output_was(self.except_status(['Task 1: 75%']))
 
           expected_io.assert_output_was(self.except_status(['Task 0: 50%']))
         expected_io.assert_output_was(self.except_status([]))
 
+  def test_terminal_size_is_cached(self):
+    """Tests that the terminal size is only queried periodically."""
+    sys.stdout = expect.ExpectedInputOutput()
+    with freezegun.freeze_time('2019-01-01 12:00:00') as frozen_time:
+      with mock.patch.object(task_manager.terminal_size, 'get_terminal_size',
+                             return_value=(80, 25)) as get_terminal_size:
+        with task_manager.TaskManager() as manager:
+          with manager.start_task(0, 'Task 0') as task:
+            frozen_time.tick(delta=datetime.timedelta(milliseconds=100))
+            task.update_status(': 50%')
+            self.assertEqual(get_terminal_size.call_count, 1)
+
+            frozen_time.tick(delta=datetime.timedelta(seconds=1))
+            task.update_status(': 75%')
+            self.assertEqual(get_terminal_size.call_count, 2)
+
+  def test_status_update_only_repaints_changed_row(self):
+    """Tests that updating a task's status only repaints that task's row."""
+    output = io.StringIO()
+    sys.stdout = output
+    with freezegun.freeze_time('2019-01-01 12:00:00') as frozen_time:
+      with mock.patch.object(task_manager.terminal_size, 'get_terminal_size',
+                             return_value=(80, 25)):
+        with task_manager.TaskManager() as manager:
+          with manager.start_task(0, 'Task 0'):
+            with manager.start_task(1, 'Task 1') as task1:
+              manager.print_status()
+              frozen_time.tick(delta=datetime.timedelta(milliseconds=100))
+              output.seek(0)
+              output.truncate()
+              task1.update_status(': 50%')
+              self.assertEqual(output.getvalue(),
+                               '\033[3BTask 1: 50%\033[K\033[3A\r')
+
+  def test_completing_task_twice(self):
+    """Tests that completing an already completed task is a no-op."""
+    sys.stdout = io.StringIO()
+    with task_manager.TaskManager() as manager:
+      manager.update_status(0, 'Task 0')
+      manager.task_completed(0, 'Task 0')
+      manager.task_completed(0, 'Task 0')
+      self.assertNotIn('Task 0', manager.get_status_string())
+
   @parameterized.expand([
       ('1234567890123456789', '1234567890123456789'),
       ('12345678901234567890', '12345678901234567890'),
@@ -3,6 +3,7 @@
 import unittest
 import queue
 import sys
+import time
 
 import io_expectation as expect
 
@@ -35,6 +36,20 @@ class TestThreadPool(unittest.TestCase):
     pool.add(self._consumer_thread, results)
     pool.join()
 
+  def test_join_waits_for_running_tasks(self):
+    """Tests that `join` returns only once all tasks are completed."""
+    done = []
+
+    def task(i):
+      time.sleep(0.01)
+      done.append(i)
+
+    pool = thread_pool.ThreadPool(2)
+    for i in range(10):
+      pool.add(task, i)
+    pool.join()
+    self.assertCountEqual(done, range(10))
+
   def test_exception(self):
     """Tests exceptions in threads."""
     mock_io = expect.ExpectedInputOutput()
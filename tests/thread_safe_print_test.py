@@ -1,5 +1,6 @@
 """Tests for thread_safe_print.py"""
 
+import io
 import queue
 import sys
 import unittest
@@ -54,3 +55,15 @@ class TestThreadSafePrint(unittest.TestCase):
         'Thread 1 starts, thread 1 finishes.',
         'Thread 2 starts, thread 2 finishes.'
     ])
+
+  def test_partial_lines_are_buffered(self):
+    """Tests that text is only written once lines are complete."""
+    output = io.StringIO()
+    sys.stdout = output
+    with thread_safe_print.ThreadSafePrint():
+      sys.stdout.write('Foo, ')
+      sys.stdout.write(b'bar')
+      self.assertEqual(output.getvalue(), '')
+
+      sys.stdout.write('.\nProgress: 50%\r')
+      self.assertEqual(output.getvalue(), 'Foo, bar.\nProgress: 50%\r')